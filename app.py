@@ -1,20 +1,32 @@
 import os
 import json
+import hashlib
 import markdown
 import numpy as np
-from functools import wraps
+from functools import wraps, lru_cache
 import cv2
+import psutil
 import sys
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 # Flask and extensions
 from flask import Flask, render_template, request, redirect, url_for, session, flash
-from flask_mysqldb import MySQL
 from flask_bcrypt import Bcrypt
-from werkzeug.utils import secure_filename
+from flask_session import Session
+import redis
+
+# Database
+import MySQLdb
+from MySQLdb.cursors import DictCursor
+from dbutils.pooled_db import PooledDB
 
 # AI and ML libraries
-import tensorflow as tf 
+from cachetools import TTLCache
+from numba import njit
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 
@@ -23,9 +35,10 @@ ai_app_src = Path(__file__).parent / "apps" / "AI_app" / "src"
 sys.path.insert(0, str(ai_app_src))
 
 # --- IMPORT YOUR CUSTOM MODULES ---
-from PlantCare_AI.utils.model_loader import ModelLoader
 from PlantCare_AI.utils.weather_info import WeatherForecastTool
 from PlantCare_AI.prompt_library.prompts import PLANT_CARE_PROMPT
+from PlantCare_AI.utils.common import write_atomic
+from convert_model import TFLITE_MODEL_PATH, ensure_tflite_model
 
 load_dotenv()
 
@@ -34,12 +47,18 @@ app = Flask(__name__)
 # --- CONFIGURATIONS ---
 # --- CONFIGURATIONS ---
 app.config['SECRET_KEY'] = '1234488%^$hra'
+# Server-side sessions in Redis when REDIS_URL is set; otherwise Flask's signed-cookie sessions are used
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis.from_url(REDIS_URL)
+    app.config['SESSION_PERMANENT'] = False
 app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST')
 app.config['MYSQL_USER'] = os.getenv('MYSQL_USER')
 app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD')
 app.config['MYSQL_DB'] = os.getenv('MYSQL_DATABASE')
 app.config['MYSQL_PORT'] = int(os.getenv('MYSQL_PORT', 3306))
-app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
+app.config['MYSQL_MAX_CONNECTIONS'] = int(os.getenv('MYSQL_MAX_CONNECTIONS', 16))
 
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
@@ -49,32 +68,182 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # --- INITIALIZE EXTENSIONS ---
-mysql = MySQL(app)
 bcrypt = Bcrypt(app)
+if REDIS_URL:
+    Session(app)
+
+# Pooled MySQL connections: opened lazily, then reused across requests instead of reconnecting
+db_pool = PooledDB(
+    creator=MySQLdb,
+    maxconnections=app.config['MYSQL_MAX_CONNECTIONS'],
+    blocking=True,
+    ping=1,
+    host=app.config['MYSQL_HOST'],
+    user=app.config['MYSQL_USER'],
+    passwd=app.config['MYSQL_PASSWORD'],
+    db=app.config['MYSQL_DB'],
+    port=app.config['MYSQL_PORT'],
+    cursorclass=DictCursor
+)
+
+def get_conn():
+    return db_pool.connection()
+
+# --- INFERENCE BATCHING ---
+
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 8))
+BATCH_TIMEOUT_MS = float(os.getenv('BATCH_TIMEOUT_MS', 10))
+
+# Fused BGR->RGB swap and uint8->float32 cast, written straight into a slot of the interpreter input
+# Serial on purpose: a 224x224 copy is cheaper than dispatching to a thread pool, and a parallel kernel
+# would start NUMBA_NUM_THREADS threads per worker on top of the TFLITE_NUM_THREADS budget
+@njit(cache=True, fastmath=True)
+def bgr_to_rgb_into(src, dst):
+    height, width, _ = src.shape
+    for y in range(height):
+        for x in range(width):
+            dst[y, x, 0] = src[y, x, 2]
+            dst[y, x, 1] = src[y, x, 1]
+            dst[y, x, 2] = src[y, x, 0]
+
+class InferenceBatcher:
+    """
+    Collects preprocessed images from concurrent requests and runs them
+    through the interpreter as one batch, so the per-invoke overhead is
+    paid once per batch instead of once per request.
+    """
+
+    def __init__(self, interpreter, input_index, output_index,
+                 max_batch_size=BATCH_MAX_SIZE, timeout_ms=BATCH_TIMEOUT_MS):
+        self.interpreter = interpreter
+        self.input_index = input_index
+        self.output_index = output_index
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout_ms / 1000
+        self.batch_size = interpreter.get_input_details()[0]['shape'][0]
+        # Views straight into the interpreter's own tensor memory, re-fetched on each call
+        # since allocate_tensors() may move them
+        self.input_tensor = interpreter.tensor(input_index)
+        self.output_tensor = interpreter.tensor(output_index)
+        self.queue = queue.Queue()
+        self.interpreter_lock = threading.Lock()
+        self.thread_lock = threading.Lock()
+        self.thread = None
+
+    def predict(self, image):
+        """Queue a resized (H, W, 3) BGR uint8 image and block until its (class index, confidence) is ready."""
+        self._ensure_worker()
+        future = Future()
+        self.queue.put((image, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Started on first use so each forked server worker gets its own thread
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def _collect(self):
+        items = [self.queue.get()]
+        deadline = time.monotonic() + self.timeout
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            images, futures = zip(*self._collect())
+            try:
+                results = self._invoke(images)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def _invoke(self, images):
+        with self.interpreter_lock:
+            if len(images) != self.batch_size:
+                shape = self.interpreter.get_input_details()[0]['shape']
+                self.interpreter.resize_tensor_input(self.input_index, (len(images), *shape[1:]))
+                self.interpreter.allocate_tensors()
+                self.batch_size = len(images)
+            # Tensor views must be released before invoke(), so they only live inside these helpers
+            self._fill_input(images)
+            self.interpreter.invoke()
+            return self._read_output()
+
+    def _fill_input(self, images):
+        batch = self.input_tensor()
+        for i, image in enumerate(images):
+            bgr_to_rgb_into(image, batch[i])
+
+    def _read_output(self):
+        results = []
+        for probs in self.output_tensor():
+            idx = int(probs.argmax())
+            results.append((idx, float(probs[idx])))
+        return results
 
 # --- INITIALIZE AI & WEATHER TOOLS ---
+# Each tool is built on first use, so signin/home traffic and worker boot never pay for TensorFlow or the LLM client
 
 # 1. Load LLM using your ModelLoader
-try:
-    llm_loader = ModelLoader(model_provider="groq")
-    llm = llm_loader.load_llm()
-except Exception as e:
-    print(f"Error loading LLM: {e}")
-    llm = None
+@lru_cache(maxsize=1)
+def get_llm():
+    from PlantCare_AI.utils.model_loader import ModelLoader
+    try:
+        llm_loader = ModelLoader(model_provider="groq")
+        return llm_loader.load_llm()
+    except Exception as e:
+        print(f"Error loading LLM: {e}")
+        return None
 
 # 2. Load Weather Tool
-weather_tool = WeatherForecastTool(api_key=os.getenv("OPENWEATHERMAP_API_KEY"))
-
-# 3. Load Disease Model
-try:
-    model = tf.keras.models.load_model('final-plant-disease-detection-model.keras')
-    with open('class_names.json', 'r') as f:
-        class_names = json.load(f)
-    if isinstance(class_names, dict):
-        class_names = [class_names[str(i)] for i in range(len(class_names))]
-except Exception as e:
-    print(f"Error loading AI model: {e}")
-    model = None
+@lru_cache(maxsize=1)
+def get_weather_tool():
+    return WeatherForecastTool(api_key=os.getenv("OPENWEATHERMAP_API_KEY"))
+
+# 3. Load Disease Model (FP16-weight TFLite model served by the XNNPACK-backed interpreter)
+# The model is converted once per deploy by convert_model.py (run from gunicorn.conf.py), never inside a request
+# One interpreter thread per physical core; gunicorn.conf.py divides the cores between workers
+TFLITE_NUM_THREADS = int(os.getenv('TFLITE_NUM_THREADS', psutil.cpu_count(logical=False) or os.cpu_count() or 1))
+
+def _load_model():
+    try:
+        import tensorflow as tf
+        interpreter = tf.lite.Interpreter(model_path=TFLITE_MODEL_PATH, num_threads=TFLITE_NUM_THREADS)
+        interpreter.allocate_tensors()
+        input_index = interpreter.get_input_details()[0]['index']
+        output_index = interpreter.get_output_details()[0]['index']
+        batcher = InferenceBatcher(interpreter, input_index, output_index)
+        # Stored as a JSON list in model output order
+        with open('class_names.json', 'r') as f:
+            class_names = tuple(json.load(f))
+        return batcher, class_names
+    except Exception as e:
+        print(f"Error loading AI model: {e}")
+        return None
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Return (batcher, class_names), loading the model on first use; None if it can't be loaded yet."""
+    global _model
+    # Concurrent first requests must not each load the model; failures are retried on the next call
+    with _model_lock:
+        if _model is None:
+            _model = _load_model()
+        return _model
 
 # --- HELPER FUNCTIONS ---
 
@@ -90,31 +259,80 @@ def login_required(f):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def preprocess_image(image_path):
-    img = cv2.imread(image_path)
+# Per-thread buffers: a request thread blocks on its prediction, so its buffers are free again on return
+INPUT_SIZE = (224, 224)
+_preprocess_buffers = threading.local()
+
+def _get_preprocess_buffer():
+    if not hasattr(_preprocess_buffers, 'bgr'):
+        _preprocess_buffers.bgr = np.empty((INPUT_SIZE[1], INPUT_SIZE[0], 3), np.uint8)
+    return _preprocess_buffers.bgr
+
+def preprocess_image(image_bytes):
+    """Decode and resize to the model input size; the batcher does the RGB swap and float cast."""
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
     if img is None: return None
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    img_resized = cv2.resize(img_rgb, (224, 224))
-    return np.expand_dims(img_resized, axis=0)
+    bgr = _get_preprocess_buffer()
+    # Resize before the colour conversion so it only touches 224x224 pixels; INTER_AREA suits downscaling
+    cv2.resize(img, INPUT_SIZE, dst=bgr, interpolation=cv2.INTER_AREA)
+    return bgr
+
+# Predictions keyed by the upload's content hash, so re-uploads of the same image skip inference
+PREDICTION_CACHE_TTL = 3600
+_prediction_cache = TTLCache(maxsize=4096, ttl=PREDICTION_CACHE_TTL)
+_prediction_cache_lock = threading.Lock()
+
+def hash_image(image_bytes):
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
 
-def predict_disease(img_path):
+def predict_disease(image_bytes, image_hash):
+    with _prediction_cache_lock:
+        cached = _prediction_cache.get(image_hash)
+    if cached: return cached
+    model = get_model()
     if model is None: return "Model not loaded", 0.0
-    processed_img = preprocess_image(img_path)
+    batcher, class_names = model
+    processed_img = preprocess_image(image_bytes)
     if processed_img is None: return "Processing failed", 0.0
-    predictions = model.predict(processed_img)
-    idx = np.argmax(predictions[0])
-    return class_names[idx], np.max(predictions[0])
+    idx, confidence = batcher.predict(processed_img)
+    result = (class_names[idx], confidence)
+    with _prediction_cache_lock:
+        _prediction_cache[image_hash] = result
+    return result
+
+# Weather responses are cached per city so repeat lookups skip the HTTP round-trip
+WEATHER_CACHE_TTL = 600
+_current_weather_cache = TTLCache(maxsize=1024, ttl=WEATHER_CACHE_TTL)
+_weather_cache_lock = threading.Lock()
+
+# Shared pool for network and disk I/O that can overlap with model inference
+io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='io')
 
-def get_combined_advice(disease_name, city):
+def save_upload(filepath, data):
+    # Uploads are named by content hash and only ever renamed into place whole,
+    # so an existing file already holds these exact bytes
+    if os.path.exists(filepath): return
+    write_atomic(filepath, data)
+
+def get_current_weather(city):
+    key = city.strip().lower()
+    with _weather_cache_lock:
+        data = _current_weather_cache.get(key)
+    if data: return data
+    data = get_weather_tool().get_current_weather(city)
+    if data:  # Failed lookups return {} and are retried next time
+        with _weather_cache_lock:
+            _current_weather_cache[key] = data
+    return data
+
+def summarize_weather(weather_data):
+    if 'main' not in weather_data: return "Weather data unavailable"
+    return f"{weather_data['weather'][0]['description'].capitalize()}, {weather_data['main']['temp']}°C"
+
+def build_advice(disease_name, weather_summary):
+    llm = get_llm()
     if not llm: return "AI advice unavailable."
     
-    # Fetch Weather
-    weather_data = weather_tool.get_current_weather(city)
-    forecast_data = weather_tool.get_forecast_weather(city)
-    
-    weather_summary = f"Weather in {city}: {weather_data.get('weather', [{}])[0].get('description', 'N/A')}, " \
-                      f"Temp: {weather_data.get('main', {}).get('temp')}°C. "
-    
     # Combine everything using your prompt
     clean_name = disease_name.replace('___', ' ').replace('_', ' ')
     chain = PLANT_CARE_PROMPT | llm | StrOutputParser()
@@ -124,6 +342,35 @@ def get_combined_advice(disease_name, city):
         "weather_data": weather_summary
     })
 
+# LLM advice depends only on the disease and a coarse weather bucket, so repeat combinations are served from memory
+ADVICE_CACHE_TTL = 3600
+_advice_cache = TTLCache(maxsize=4096, ttl=ADVICE_CACHE_TTL)
+_advice_cache_lock = threading.Lock()
+
+def get_advice(disease_name, weather_data):
+    if 'main' in weather_data:
+        key = (disease_name, weather_data['weather'][0]['description'], round(weather_data['main']['temp']))
+    else:
+        key = (disease_name, None, None)
+    with _advice_cache_lock:
+        advice = _advice_cache.get(key)
+    if advice: return advice
+    advice = build_advice(disease_name, summarize_weather(weather_data))
+    if get_llm():
+        with _advice_cache_lock:
+            _advice_cache[key] = advice
+    return advice
+
+# One Markdown converter reused across requests; it keeps parser state, so access is serialized
+_markdown = markdown.Markdown(extensions=['fenced_code', 'tables'])
+_markdown_lock = threading.Lock()
+
+@lru_cache(maxsize=2048)
+def render_markdown(text):
+    with _markdown_lock:
+        _markdown.reset()
+        return _markdown.convert(text)
+
 # --- ROUTES ---
 
 @app.route('/')
@@ -151,23 +398,22 @@ def signup():
             return redirect(url_for('signup'))
         
         try:
-            # Check if user exists
-            cursor = mysql.connection.cursor()
-            cursor.execute("SELECT * FROM users WHERE email=%s", (email,))
-            user = cursor.fetchone()
-            
-            if user:
-                flash('Email already registered!', 'danger')
-                return redirect(url_for('signup'))
-            
-            # Hash password
-            hashed_password = bcrypt.generate_password_hash(password)
-            
-            # Insert new user
-            cursor.execute("INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
-                         (fullName, email, hashed_password))
-            mysql.connection.commit()
-            cursor.close()
+            with get_conn() as conn, conn.cursor() as cursor:
+                # Check if user exists
+                cursor.execute("SELECT id FROM users WHERE email=%s LIMIT 1", (email,))
+                user = cursor.fetchone()
+                
+                if user:
+                    flash('Email already registered!', 'danger')
+                    return redirect(url_for('signup'))
+                
+                # Hash password
+                hashed_password = bcrypt.generate_password_hash(password)
+                
+                # Insert new user
+                cursor.execute("INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
+                             (fullName, email, hashed_password))
+                conn.commit()
             
             flash('Account created successfully! Please sign in.', 'success')
             return redirect(url_for('signin'))
@@ -188,10 +434,9 @@ def signin():
             return redirect(url_for('signin'))
         
         try:
-            cursor = mysql.connection.cursor()
-            cursor.execute("SELECT * FROM users WHERE email=%s", (email,))
-            user = cursor.fetchone()
-            cursor.close()
+            with get_conn() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT id, name, password FROM users WHERE email=%s LIMIT 1", (email,))
+                user = cursor.fetchone()
             
             if user and bcrypt.check_password_hash(user['password'], password):  # Use DictCursor
                 session['logged_in'] = True
@@ -222,24 +467,25 @@ def analyze():
         file = request.files.get('file')
 
         if file and allowed_file(file.filename) and city:
-            filename = secure_filename(file.filename)
+            image_bytes = file.read()
+            image_hash = hash_image(image_bytes)
+            filename = f"{image_hash}.{file.filename.rsplit('.', 1)[1].lower()}"
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
             
-            # 1. Prediction
-            disease, confidence = predict_disease(filepath)
+            # 1. Prediction from the in-memory upload; the preview copy and the weather fetch run alongside it
+            save_future = io_executor.submit(save_upload, filepath, image_bytes)
+            weather_future = io_executor.submit(get_current_weather, city)
+            disease, confidence = predict_disease(image_bytes, image_hash)
             
-            # 2. Weather & AI Advice (Using your new modules)
-            # Fetch current weather
-            weather_data = weather_tool.get_current_weather(city)
-            weather_summary = f"{weather_data['weather'][0]['description'].capitalize()}, {weather_data['main']['temp']}°C" if 'main' in weather_data else "Weather data unavailable"
-
-            # 3. Generate combined advice using prompt
-            chain = PLANT_CARE_PROMPT | llm | StrOutputParser()
-            advice_md = chain.invoke({
-                "disease": disease.replace('___', ' ').replace('_', ' '),
-                "weather_data": weather_summary
-            })
+            # 2. Weather (fetched once, shared by the page and the prompt)
+            weather_data = weather_future.result()
+            weather_summary = summarize_weather(weather_data)
+
+            # 3. Generate combined advice using prompt (cached per disease and weather bucket)
+            advice_md = get_advice(disease, weather_data)
+
+            # The preview image must be on disk before the page that links to it is served
+            save_future.result()
 
             return render_template('analyze.html',
                                    filename=filename,
@@ -247,10 +493,16 @@ def analyze():
                                    confidence=f"{round(confidence * 100, 2)}%",
                                    weather=weather_summary,
                                    city=city,
-                                   remedy=markdown.markdown(advice_md))
+                                   remedy=render_markdown(advice_md))
     
     return render_template('analyze.html')
 
 if __name__ == '__main__':
+    # Local development only; in production run: gunicorn app:app (see gunicorn.conf.py)
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    try:
+        ensure_tflite_model()
+    except Exception as e:
+        # Signin/home still work without a model; /analyze reports "Model not loaded"
+        print(f"Error converting AI model: {e}")
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import yaml
 from pathlib import Path
 from box import ConfigBox # Optional: Isse dictionary ['key'] ki jagah .key use ho jata hai
@@ -8,4 +10,22 @@ def read_yaml(path: Path) -> dict:
             content = yaml.safe_load(f)
             return content
     except Exception as e:
-        raise Exception(f"Error reading config file at {path}: {e}")
\ No newline at end of file
+        raise Exception(f"Error reading config file at {path}: {e}")
+
+# os.umask can only be read by setting it, so do it once at import rather than from worker threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write data to a temp file next to path, then rename it into place so readers never see a partial file."""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates 0600 files; give the result the mode a plain open() would have
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 from typing import Literal, Optional, Any
 from pydantic import BaseModel, Field
 from pathlib import Path
+from functools import lru_cache
 
 # Add parent directory to path for imports
 import sys
@@ -28,10 +29,15 @@ load_dotenv(override=True)
 # Set config path
 CONFIG_PATH = Path(__file__).parent.parent.parent.parent / "config" / "config.yaml"
 
+@lru_cache(maxsize=1)
+def _load_config() -> dict:
+    # Parsed once per process and shared by every ConfigLoader
+    print(f"Loading config from {CONFIG_PATH}...")
+    return read_yaml(CONFIG_PATH)
+
 class ConfigLoader:
     def __init__(self):
-        print(f"Loading config from {CONFIG_PATH}...")
-        self.config = read_yaml(CONFIG_PATH)
+        self.config = _load_config()
     
     def __getitem__(self, key):
         return self.config[key]
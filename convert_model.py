@@ -0,0 +1,39 @@
+import os
+import sys
+from pathlib import Path
+
+# --- ADD PATH FOR CUSTOM MODULES ---
+ai_app_src = Path(__file__).parent / "apps" / "AI_app" / "src"
+sys.path.insert(0, str(ai_app_src))
+
+from PlantCare_AI.utils.common import write_atomic
+
+KERAS_MODEL_PATH = 'final-plant-disease-detection-model.keras'
+TFLITE_MODEL_PATH = 'model_fp16.tflite'
+
+def convert_to_tflite(keras_path, tflite_path):
+    import tensorflow as tf
+    keras_model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    # FP16 weights halve the file size; they are upcast to FP32 at load, so compute stays FP32.
+    # Avoid full INT8 quantization: INT8 TFLite kernels are often slower than FP32 on x86.
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    # Renamed into place, so a running server never loads a half-written model
+    write_atomic(tflite_path, converter.convert())
+
+def ensure_tflite_model(keras_path=KERAS_MODEL_PATH, tflite_path=TFLITE_MODEL_PATH):
+    """Convert the Keras model unless an up-to-date TFLite model is already on disk."""
+    if os.path.exists(tflite_path) and (
+            not os.path.exists(keras_path) or os.path.getmtime(tflite_path) >= os.path.getmtime(keras_path)):
+        return
+    print(f"Converting {keras_path} to {tflite_path}...")
+    convert_to_tflite(keras_path, tflite_path)
+
+if __name__ == '__main__':
+    # Run once per deploy; gunicorn.conf.py calls this from the master before any worker starts
+    try:
+        ensure_tflite_model()
+    except Exception as e:
+        print(f"Error converting AI model: {e}")
+        sys.exit(1)
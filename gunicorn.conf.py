@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import psutil
+
+# Production server config, picked up automatically by: gunicorn app:app
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+# Split physical cores between workers so interpreter threads don't oversubscribe the CPU
+physical_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+os.environ.setdefault('TFLITE_NUM_THREADS', str(max(1, physical_cores // workers)))
+# Threaded workers let concurrent /analyze requests share one batched invoke
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+# Import app.py once in the master; the model itself is loaded per worker on its first /analyze
+preload_app = True
+# LLM advice can take several seconds
+timeout = 120
+
+
+def on_starting(server):
+    # Convert the Keras model once per deploy, before any worker can load it. Runs in a child process
+    # so the master never imports TensorFlow, and outside any request so worker timeouts don't apply.
+    result = subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), 'convert_model.py')])
+    # Not fatal: signin/home keep working and /analyze reports "Model not loaded"
+    if result.returncode != 0:
+        server.log.error("Model conversion failed (exit code %s); /analyze will be unavailable", result.returncode)